@@ -1,13 +1,15 @@
 import time
 from bson import ObjectId
+from pymongo import ReturnDocument
 from flask_restx import fields, Namespace
 from app.utils import get_logger, auth
 from app import utils
 from app.utils.github_repo_task import (
-    find_github_repo_scheduler, 
-    delete_github_repo_scheduler,
-    recover_github_repo_task,
-    stop_github_repo_task
+    find_github_repo_scheduler,
+    find_github_repo_schedulers_by_ids,
+    delete_github_repo_schedulers,
+    recover_github_repo_tasks,
+    stop_github_repo_tasks
 )
 from . import base_query_fields, ARLResource, get_arl_parser
 from app.modules import SchedulerStatus, ErrorMsg
@@ -16,6 +18,22 @@ ns = Namespace('github_repo_scheduler', description="GitHub 仓库监控调度")
 
 logger = get_logger()
 
+def dedupe_job_ids(job_id_list):
+    """
+    Remove duplicate IDs while keeping their order
+
+    Returns None if the list is empty or contains an invalid ObjectId,
+    so the request fails before querying MongoDB.
+    """
+    if not job_id_list:
+        return None
+
+    if not all(ObjectId.is_valid(job_id) for job_id in job_id_list):
+        return None
+
+    return list(dict.fromkeys(job_id_list))
+
+
 base_search_fields = {
     'name': fields.String(required=False, description="任务名"),
     'repo_owner': fields.String(description="仓库所有者"),
@@ -66,12 +84,10 @@ class ARLGithubRepoScheduler(ARLResource):
             return utils.build_ret(ErrorMsg.Error, {"message": "仓库所有者和仓库名称不能为空"})
 
         # Validate cron expression
-        check_flag, msg = utils.check_cron_interval(cron)
+        check_flag, msg, next_sec = utils.check_cron_next(cron)
         if not check_flag:
             return msg
 
-        previous, next_sec, _ = utils.check_cron(cron)
-
         scheduler_data = {
             "name": name,
             "repo_owner": repo_owner,
@@ -106,17 +122,18 @@ class DeleteGithubRepoScheduler(ARLResource):
         删除 GitHub 仓库监控任务
         """
         args = self.parse_args(delete_github_repo_scheduler_fields)
-        job_id_list = args.get("_id", [])
+        job_id_list = dedupe_job_ids(args.get("_id"))
+        if not job_id_list:
+            return utils.build_ret(ErrorMsg.Error, {"_id": args.get("_id")})
 
         ret_data = {"_id": job_id_list}
 
-        for job_id in job_id_list:
-            item = find_github_repo_scheduler(job_id)
-            if not item:
-                return utils.build_ret(ErrorMsg.JobNotFound, ret_data)
+        items = find_github_repo_schedulers_by_ids(job_id_list)
+        missing = set(job_id_list) - items.keys()
+        if missing:
+            return utils.build_ret(ErrorMsg.JobNotFound, ret_data)
 
-        for job_id in job_id_list:
-            delete_github_repo_scheduler(job_id)
+        delete_github_repo_schedulers(job_id_list)
 
         return utils.build_ret(ErrorMsg.Success, ret_data)
 
@@ -148,33 +165,36 @@ class UpdateGithubRepoScheduler(ARLResource):
         cron = args.pop('cron')
         monitored_events = args.pop('monitored_events')
 
-        item = find_github_repo_scheduler(job_id)
-        if not item:
-            return utils.build_ret(ErrorMsg.JobNotFound, {"_id": job_id})
-
+        updates = {}
         if name:
-            item["name"] = name
+            updates["name"] = name
 
         if repo_owner:
-            item["repo_owner"] = repo_owner.strip()
+            updates["repo_owner"] = repo_owner.strip()
 
         if repo_name:
-            item["repo_name"] = repo_name.strip()
-        
+            updates["repo_name"] = repo_name.strip()
+
         if monitored_events:
-            item["monitored_events"] = monitored_events
+            updates["monitored_events"] = monitored_events
 
         if cron:
-            check_flag, msg = utils.check_cron_interval(cron)
+            check_flag, msg, next_sec = utils.check_cron_next(cron)
             if not check_flag:
                 return msg
 
-            previous, next_sec, _ = utils.check_cron(cron)
-            item["next_run_date"] = utils.time2date(time.time() + next_sec)
-            item["cron"] = cron
+            updates["next_run_date"] = utils.time2date(time.time() + next_sec)
+            updates["cron"] = cron
 
-        query = {"_id": ObjectId(job_id)}
-        utils.conn_db('github_repo_scheduler').find_one_and_replace(query, item)
+        if updates:
+            query = {"_id": ObjectId(job_id)}
+            item = utils.conn_db('github_repo_scheduler').find_one_and_update(
+                query, {"$set": updates}, return_document=ReturnDocument.AFTER)
+        else:
+            item = find_github_repo_scheduler(job_id)
+
+        if not item:
+            return utils.build_ret(ErrorMsg.JobNotFound, {"_id": job_id})
 
         item["_id"] = str(item["_id"])
 
@@ -196,18 +216,26 @@ class RecoverGithubRepoScheduler(ARLResource):
         恢复 GitHub 仓库监控周期任务
         """
         args = self.parse_args(recover_github_repo_scheduler_fields)
-        job_id_list = args.get("_id")
+        job_id_list = dedupe_job_ids(args.get("_id"))
+        if not job_id_list:
+            return utils.build_ret(ErrorMsg.Error, {"_id": args.get("_id")})
 
+        items = find_github_repo_schedulers_by_ids(job_id_list)
+        missing = set(job_id_list) - items.keys()
         for job_id in job_id_list:
-            item = find_github_repo_scheduler(job_id)
-            if not item:
+            if job_id in missing:
                 return utils.build_ret(ErrorMsg.JobNotFound, {"_id": job_id})
 
-            status = item.get("status", SchedulerStatus.RUNNING)
+            status = items[job_id].get("status", SchedulerStatus.RUNNING)
             if status != SchedulerStatus.STOP:
                 return utils.build_ret(ErrorMsg.SchedulerStatusNotStop, {"_id": job_id})
 
-            recover_github_repo_task(_id=job_id)
+        # A concurrent status change after the check makes the batch partially succeed,
+        # report both the IDs that failed and the ones that were recovered
+        recovered = recover_github_repo_tasks(list(items.values()))
+        if len(recovered) != len(job_id_list):
+            failed = [job_id for job_id in job_id_list if job_id not in recovered]
+            return utils.build_ret(ErrorMsg.SchedulerStatusNotStop, {"_id": failed, "job_id_list": recovered})
 
         return utils.build_ret(ErrorMsg.Success, {"job_id_list": job_id_list})
 
@@ -227,17 +255,25 @@ class StopGithubRepoScheduler(ARLResource):
         停止 GitHub 仓库监控周期任务
         """
         args = self.parse_args(stop_github_repo_scheduler_fields)
-        job_id_list = args.get("_id")
+        job_id_list = dedupe_job_ids(args.get("_id"))
+        if not job_id_list:
+            return utils.build_ret(ErrorMsg.Error, {"_id": args.get("_id")})
 
+        items = find_github_repo_schedulers_by_ids(job_id_list)
+        missing = set(job_id_list) - items.keys()
         for job_id in job_id_list:
-            item = find_github_repo_scheduler(job_id)
-            if not item:
+            if job_id in missing:
                 return utils.build_ret(ErrorMsg.JobNotFound, {"_id": job_id})
 
-            status = item.get("status", SchedulerStatus.RUNNING)
+            status = items[job_id].get("status", SchedulerStatus.RUNNING)
             if status != SchedulerStatus.RUNNING:
                 return utils.build_ret(ErrorMsg.SchedulerStatusNotRunning, {"_id": job_id})
 
-            stop_github_repo_task(_id=job_id)
+        # A concurrent status change after the check makes the batch partially succeed,
+        # report both the IDs that failed and the ones that were stopped
+        stopped = stop_github_repo_tasks(list(items.values()))
+        if len(stopped) != len(job_id_list):
+            failed = [job_id for job_id in job_id_list if job_id not in stopped]
+            return utils.build_ret(ErrorMsg.SchedulerStatusNotRunning, {"_id": failed, "job_id_list": stopped})
 
         return utils.build_ret(ErrorMsg.Success, {"job_id_list": job_id_list})
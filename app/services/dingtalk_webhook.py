@@ -3,37 +3,59 @@ import base64
 import hmac
 import urllib.parse
 import hashlib
-from app.utils import http_req, get_logger
+from app.utils import http_req, get_logger, new_session, json_loads, json_dumps
 from app.config import Config
 
 logger = get_logger()
 
+# Shared connection pool so repeated notifications reuse the TLS connection
+_session = new_session()
+
 
 class DingTalkWebhook:
     """DingTalk webhook notification service"""
     
-    def __init__(self, webhook_url=None, secret=None):
+    def __init__(self, webhook_url=None, secret=None, session=None):
         """
         Initialize DingTalk webhook
         
         Args:
             webhook_url: DingTalk webhook URL (if None, use Config.DINGTALK_WEBHOOK_URL)
             secret: DingTalk webhook secret (if None, use Config.DINGTALK_SECRET)
+            session: requests.Session to send with (if None, use the shared module session)
         """
         self.webhook_url = webhook_url or Config.DINGTALK_WEBHOOK_URL
         self.secret = secret or Config.DINGDING_SECRET
+        self.session = session or _session
         
         if not self.webhook_url:
             logger.warning("DingTalk webhook URL is not configured")
+
+        # Key the HMAC once; each signature only copies the prepared state.
+        # _signed_url is bound here so sending does not branch on the secret
+        self._hmac_template = None
+        if self.secret:
+            self._hmac_template = hmac.new(self.secret.encode('utf-8'), digestmod=hashlib.sha256)
+            # Plain prefix, the configured URL is never passed through str.format
+            self._url_prefix = f"{self.webhook_url}&timestamp="
+            self._signed_url = self._build_signed_url
+        else:
+            self._signed_url = self._build_plain_url
+
+    def _build_signed_url(self):
+        timestamp, sign = self._generate_sign()
+        return f"{self._url_prefix}{timestamp}&sign={sign}"
+
+    def _build_plain_url(self):
+        return self.webhook_url
     
     def _generate_sign(self):
         """Generate DingTalk webhook signature"""
         timestamp = str(round(time.time() * 1000))
-        secret_enc = self.secret.encode('utf-8')
         string_to_sign = f'{timestamp}\n{self.secret}'
-        string_to_sign_enc = string_to_sign.encode('utf-8')
-        hmac_code = hmac.new(secret_enc, string_to_sign_enc, digestmod=hashlib.sha256).digest()
-        sign = urllib.parse.quote_plus(base64.b64encode(hmac_code))
+        hmac_code = self._hmac_template.copy()
+        hmac_code.update(string_to_sign.encode('utf-8'))
+        sign = urllib.parse.quote_plus(base64.b64encode(hmac_code.digest()))
         return timestamp, sign
     
     def send_text(self, content, at_mobiles=None, is_at_all=False):
@@ -52,12 +74,8 @@ class DingTalkWebhook:
             logger.error("DingTalk webhook URL is not configured")
             return {"errcode": -1, "errmsg": "Webhook URL not configured"}
         
-        url = self.webhook_url
-        
-        # Add signature if secret is configured
-        if self.secret:
-            timestamp, sign = self._generate_sign()
-            url = f"{url}&timestamp={timestamp}&sign={sign}"
+        # Signed when a secret is configured
+        url = self._signed_url()
         
         message = {
             "msgtype": "text",
@@ -73,8 +91,9 @@ class DingTalkWebhook:
             }
         
         try:
-            conn = http_req(url, method='post', json=message)
-            response = conn.json()
+            conn = http_req(url, method='post', session=self.session, data=json_dumps(message),
+                            headers={"Content-Type": "application/json"})
+            response = json_loads(conn.content)
             
             if response.get("errcode", -1) == 0:
                 logger.info("DingTalk text message sent successfully")
@@ -104,12 +123,8 @@ class DingTalkWebhook:
             logger.error("DingTalk webhook URL is not configured")
             return {"errcode": -1, "errmsg": "Webhook URL not configured"}
         
-        url = self.webhook_url
-        
-        # Add signature if secret is configured
-        if self.secret:
-            timestamp, sign = self._generate_sign()
-            url = f"{url}&timestamp={timestamp}&sign={sign}"
+        # Signed when a secret is configured
+        url = self._signed_url()
         
         message = {
             "msgtype": "markdown",
@@ -126,8 +141,9 @@ class DingTalkWebhook:
             }
         
         try:
-            conn = http_req(url, method='post', json=message)
-            response = conn.json()
+            conn = http_req(url, method='post', session=self.session, data=json_dumps(message),
+                            headers={"Content-Type": "application/json"})
+            response = json_loads(conn.content)
             
             if response.get("errcode", -1) == 0:
                 logger.info("DingTalk markdown message sent successfully")
@@ -157,12 +173,8 @@ class DingTalkWebhook:
             logger.error("DingTalk webhook URL is not configured")
             return {"errcode": -1, "errmsg": "Webhook URL not configured"}
         
-        url = self.webhook_url
-        
-        # Add signature if secret is configured
-        if self.secret:
-            timestamp, sign = self._generate_sign()
-            url = f"{url}&timestamp={timestamp}&sign={sign}"
+        # Signed when a secret is configured
+        url = self._signed_url()
         
         message = {
             "msgtype": "link",
@@ -177,8 +189,9 @@ class DingTalkWebhook:
             message["link"]["picUrl"] = pic_url
         
         try:
-            conn = http_req(url, method='post', json=message)
-            response = conn.json()
+            conn = http_req(url, method='post', session=self.session, data=json_dumps(message),
+                            headers={"Content-Type": "application/json"})
+            response = json_loads(conn.content)
             
             if response.get("errcode", -1) == 0:
                 logger.info("DingTalk link message sent successfully")
@@ -192,7 +205,7 @@ class DingTalkWebhook:
             return {"errcode": -1, "errmsg": str(e)}
 
 
-def send_github_event_notification(repo_owner, repo_name, events, webhook_url=None, secret=None):
+def send_github_event_notification(repo_owner, repo_name, events, webhook_url=None, secret=None, session=None):
     """
     Send GitHub event notification to DingTalk
     
@@ -202,13 +215,14 @@ def send_github_event_notification(repo_owner, repo_name, events, webhook_url=No
         events: List of GithubRepoEvent objects
         webhook_url: DingTalk webhook URL (optional)
         secret: DingTalk webhook secret (optional)
+        session: requests.Session to send with (optional)
     
     Returns:
         Response from DingTalk
     """
     from app.services.github_repo_monitor import format_events_for_dingtalk
     
-    dingtalk = DingTalkWebhook(webhook_url, secret)
+    dingtalk = DingTalkWebhook(webhook_url, secret, session=session)
     
     title = f"GitHub 监控 - {repo_owner}/{repo_name}"
     content = format_events_for_dingtalk(repo_owner, repo_name, events)
@@ -216,7 +230,7 @@ def send_github_event_notification(repo_owner, repo_name, events, webhook_url=No
     return dingtalk.send_markdown(title, content)
 
 
-def send_dingtalk_notification(title, content, msgtype="markdown", webhook_url=None, secret=None):
+def send_dingtalk_notification(title, content, msgtype="markdown", webhook_url=None, secret=None, session=None):
     """
     Send notification to DingTalk
     
@@ -226,11 +240,12 @@ def send_dingtalk_notification(title, content, msgtype="markdown", webhook_url=N
         msgtype: Message type ('text' or 'markdown')
         webhook_url: DingTalk webhook URL (optional)
         secret: DingTalk webhook secret (optional)
+        session: requests.Session to send with (optional)
     
     Returns:
         Response from DingTalk
     """
-    dingtalk = DingTalkWebhook(webhook_url, secret)
+    dingtalk = DingTalkWebhook(webhook_url, secret, session=session)
     
     if msgtype == "text":
         return dingtalk.send_text(content)
@@ -19,6 +19,7 @@ class GithubResult(object):
         self.hash_md5 = gen_md5(self.repo_full_name + "/" + item["path"])
         self._commit_date = None  # 记录文件最后一次 Commit 时间
         self._content = None
+        self._human_content = {}  # 按关键字缓存，入库和邮件报告共用
 
     def __str__(self):
         return "{} {}".format(self.repo_full_name, self.path)
@@ -72,6 +73,9 @@ class GithubResult(object):
         return self._commit_date
 
     def human_content(self, keyword):
+        if keyword in self._human_content:
+            return self._human_content[keyword]
+
         lines = self.content.split("\n")
         max_len = 8
         before_lines = deque(maxlen=max_len)
@@ -83,7 +87,9 @@ class GithubResult(object):
             index += 1
 
         after_lines = lines[index:index + max_len]
-        return "{}\n{}".format("\n".join(before_lines), "\n".join(after_lines))
+        human_content = "{}\n{}".format("\n".join(before_lines), "\n".join(after_lines))
+        self._human_content[keyword] = human_content
+        return human_content
 
     def to_dict(self):
         item = {
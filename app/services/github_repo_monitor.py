@@ -1,48 +1,174 @@
-from app.utils import http_req, get_logger, gen_md5
+from app.utils import http_req, get_logger, gen_md5, new_session, json_loads, conn_db
 from app.config import Config
-from app.utils.time import parse_datetime
+from app.utils.time import format_github_datetime
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from pymongo.errors import BulkWriteError
 
 logger = get_logger()
 
+# Shared connection pool so scheduler ticks reuse the GitHub API connection
+_session = new_session()
+
+# Rate limit state reported by GitHub, shared by all monitor threads
+_rate_lock = threading.Lock()
+_rate_state = {"remaining": 5000, "reset_at": 0}
+
+# Stop issuing requests when fewer than this many calls remain in the window
+RATE_LIMIT_RESERVE = 10
+
+
+def _wait_rate_limit():
+    """Sleep until the rate limit window resets if it is nearly exhausted"""
+    with _rate_lock:
+        remaining = _rate_state["remaining"]
+        reset_at = _rate_state["reset_at"]
+
+    if remaining >= RATE_LIMIT_RESERVE:
+        return
+
+    wait_sec = reset_at - time.time()
+    if wait_sec > 0:
+        logger.warning(f"GitHub rate limit nearly exhausted, sleeping {wait_sec:.0f}s")
+        time.sleep(wait_sec)
+
+
+def _update_rate_limit(headers):
+    """Record rate limit state from GitHub response headers"""
+    remaining = headers.get("X-RateLimit-Remaining")
+    reset_at = headers.get("X-RateLimit-Reset")
+    if remaining is None or reset_at is None:
+        return
+
+    with _rate_lock:
+        _rate_state["remaining"] = int(remaining)
+        _rate_state["reset_at"] = int(reset_at)
+
+
+def _retry_after(conn):
+    """Seconds GitHub asks to wait before retrying, None if not throttled"""
+    if conn.status_code not in (403, 429):
+        return None
+
+    retry_after = conn.headers.get("Retry-After")
+    if retry_after and retry_after.isdigit():
+        return int(retry_after)
+
+    return None
+
+
+def _rate_limited_get(url, headers):
+    """GET a GitHub API URL, waiting on rate limit headers instead of a fixed sleep"""
+    _wait_rate_limit()
+    conn = http_req(url, session=_session, headers=headers)
+    _update_rate_limit(conn.headers)
+
+    # Secondary rate limit, retry once after the requested delay
+    wait_sec = _retry_after(conn)
+    if wait_sec is not None:
+        logger.warning(f"GitHub secondary rate limit hit, retrying after {wait_sec}s")
+        time.sleep(wait_sec)
+        conn = http_req(url, session=_session, headers=headers)
+        _update_rate_limit(conn.headers)
+
+    return conn
+
+
+# MongoDB error code for a unique index violation
+DUPLICATE_KEY_ERROR = 11000
+
+# Events requested per fetch, older events are covered by the previous run
+EVENTS_PER_PAGE = 30
+
+# Events monitored when the scheduler does not specify any
+DEFAULT_EVENTS = (
+    'PushEvent',
+    'IssuesEvent',
+    'PullRequestEvent',
+    'CreateEvent',
+    'DeleteEvent',
+    'ReleaseEvent'
+)
+
 
 class GithubRepoEvent:
     """Represents a GitHub repository event"""
+
+    # Only the fields used by summaries and notifications are kept,
+    # the raw event payload is dropped after parsing
+    __slots__ = ('event_type', 'event_id', 'repo_name', 'actor', 'created_at',
+                 'action', 'ref', 'ref_type', 'size', 'commit_msg', 'title',
+                 'issue_url', 'pr_url', 'release_url')
     
     def __init__(self, event_data, event_type):
-        self.event_data = event_data
         self.event_type = event_type
         self.repo_name = event_data.get('repo', {}).get('name', '')
         self.created_at = event_data.get('created_at', '')
-        self._parse_event()
+
+        # Defaults for fields only some event types fill in
+        self.action = ''
+        self.ref = ''
+        self.ref_type = ''
+        self.size = 0
+        self.commit_msg = None
+        self.title = ''
+        self.issue_url = None
+        self.pr_url = None
+        self.release_url = None
+
+        self._parse_event(event_data)
     
-    def _parse_event(self):
+    def _parse_event(self, event_data):
         """Parse event data based on event type"""
-        self.actor = self.event_data.get('actor', {}).get('login', 'Unknown')
-        self.event_id = self.event_data.get('id', '')
-        
-        payload = self.event_data.get('payload', {})
+        self.actor = event_data.get('actor', {}).get('login', 'Unknown')
+        self.event_id = event_data.get('id', '')
         
-        if self.event_type == 'PushEvent':
-            self.commits = payload.get('commits', [])
-            self.ref = payload.get('ref', '')
-            self.size = payload.get('size', 0)
-        elif self.event_type == 'IssuesEvent':
-            self.action = payload.get('action', '')
-            self.issue = payload.get('issue', {})
-        elif self.event_type == 'PullRequestEvent':
-            self.action = payload.get('action', '')
-            self.pull_request = payload.get('pull_request', {})
-        elif self.event_type == 'CreateEvent':
-            self.ref_type = payload.get('ref_type', '')
-            self.ref = payload.get('ref', '')
-        elif self.event_type == 'DeleteEvent':
-            self.ref_type = payload.get('ref_type', '')
-            self.ref = payload.get('ref', '')
-        elif self.event_type == 'ReleaseEvent':
-            self.action = payload.get('action', '')
-            self.release = payload.get('release', {})
+        payload = event_data.get('payload', {})
+
+        parser = self._PARSERS.get(self.event_type)
+        if parser:
+            parser(self, payload)
+
+    def _parse_push(self, payload):
+        commits = payload.get('commits', [])
+        if commits:
+            self.commit_msg = commits[0].get('message', 'N/A')
+        self.ref = payload.get('ref', '')
+        self.size = payload.get('size', 0)
+
+    def _parse_issues(self, payload):
+        issue = payload.get('issue', {})
+        self.action = payload.get('action', '')
+        self.title = issue.get('title', 'Unknown issue')
+        self.issue_url = issue.get('html_url', 'N/A')
+
+    def _parse_pull_request(self, payload):
+        pull_request = payload.get('pull_request', {})
+        self.action = payload.get('action', '')
+        self.title = pull_request.get('title', 'Unknown PR')
+        self.pr_url = pull_request.get('html_url', 'N/A')
+
+    def _parse_ref(self, payload):
+        self.ref_type = payload.get('ref_type', '')
+        self.ref = payload.get('ref', '')
+
+    def _parse_release(self, payload):
+        release = payload.get('release', {})
+        self.action = payload.get('action', '')
+        self.title = release.get('name', release.get('tag_name', 'Unknown'))
+        self.release_url = release.get('html_url', 'N/A')
+
+    # Event type -> payload parser
+    _PARSERS = {
+        'PushEvent': _parse_push,
+        'IssuesEvent': _parse_issues,
+        'PullRequestEvent': _parse_pull_request,
+        'CreateEvent': _parse_ref,
+        'DeleteEvent': _parse_ref,
+        'ReleaseEvent': _parse_release,
+    }
     
     def to_dict(self):
         """Convert event to dictionary"""
@@ -52,7 +178,7 @@ class GithubRepoEvent:
             'repo_name': self.repo_name,
             'actor': self.actor,
             'created_at': self.created_at,
-            'event_data': self.event_data
+            'summary': self.get_summary()
         }
     
     def get_summary(self):
@@ -61,18 +187,15 @@ class GithubRepoEvent:
             branch = self.ref.split('/')[-1] if self.ref else 'unknown'
             return f"{self.actor} pushed {self.size} commit(s) to {branch}"
         elif self.event_type == 'IssuesEvent':
-            issue_title = self.issue.get('title', 'Unknown issue')
-            return f"{self.actor} {self.action} issue: {issue_title}"
+            return f"{self.actor} {self.action} issue: {self.title}"
         elif self.event_type == 'PullRequestEvent':
-            pr_title = self.pull_request.get('title', 'Unknown PR')
-            return f"{self.actor} {self.action} pull request: {pr_title}"
+            return f"{self.actor} {self.action} pull request: {self.title}"
         elif self.event_type == 'CreateEvent':
             return f"{self.actor} created {self.ref_type}: {self.ref}"
         elif self.event_type == 'DeleteEvent':
             return f"{self.actor} deleted {self.ref_type}: {self.ref}"
         elif self.event_type == 'ReleaseEvent':
-            release_name = self.release.get('name', self.release.get('tag_name', 'Unknown'))
-            return f"{self.actor} {self.action} release: {release_name}"
+            return f"{self.actor} {self.action} release: {self.title}"
         else:
             return f"{self.actor} triggered {self.event_type}"
 
@@ -87,67 +210,75 @@ class GithubRepoMonitor:
         
         # Default events to monitor
         if monitored_events is None:
-            self.monitored_events = [
-                'PushEvent', 
-                'IssuesEvent', 
-                'PullRequestEvent',
-                'CreateEvent',
-                'DeleteEvent',
-                'ReleaseEvent'
-            ]
-        else:
-            self.monitored_events = monitored_events
+            monitored_events = DEFAULT_EVENTS
+
+        self.monitored_events = frozenset(monitored_events)
         
         self.events = []
+        self.etag = None
     
-    def fetch_events(self, since_time=None):
+    def fetch_events(self, since_time=None, etag=None):
         """
         Fetch recent events from GitHub repository
         
         Args:
             since_time: Only fetch events after this time (datetime object)
+            etag: ETag of the previous response, the request is skipped
+                  by GitHub with 304 when nothing changed
         
         Returns:
             List of GithubRepoEvent objects
         """
+        self.etag = etag
+
         if not Config.GITHUB_TOKEN:
             logger.error("GITHUB_TOKEN is not configured")
             return []
         
-        url = f"https://api.github.com/repos/{self.full_repo_name}/events"
+        url = f"https://api.github.com/repos/{self.full_repo_name}/events?per_page={EVENTS_PER_PAGE}"
         
         headers = {
             "Authorization": f"Bearer {Config.GITHUB_TOKEN}",
             "Accept": "application/vnd.github.v3+json"
         }
+        if etag:
+            headers["If-None-Match"] = etag
         
         try:
-            # Add rate limiting
-            time.sleep(1)
-            
-            conn = http_req(url, headers=headers)
-            
+            conn = _rate_limited_get(url, headers)
+
+            if conn.status_code == 304:
+                logger.info(f"No new events for {self.full_repo_name} (not modified)")
+                return self.events
+
             if conn.status_code != 200:
                 logger.error(f"Failed to fetch events for {self.full_repo_name}: {conn.status_code}")
                 return []
             
-            data = conn.json()
+            data = json_loads(conn.content)
             
+            # GitHub timestamps are ISO-8601 in UTC, so string order is time order
+            since_iso = format_github_datetime(since_time) if since_time else None
+
             for event_data in data:
+                # Events are returned newest first, stop at the first old one
+                if since_iso:
+                    event_created_at = event_data.get('created_at', '')
+                    if event_created_at and event_created_at <= since_iso:
+                        break
+
                 event_type = event_data.get('type', '')
                 
                 # Filter by event type
                 if event_type not in self.monitored_events:
                     continue
                 
-                # Filter by time if specified
-                if since_time:
-                    event_created_at = parse_datetime(event_data.get('created_at', ''))
-                    if event_created_at and event_created_at <= since_time:
-                        continue
-                
                 event = GithubRepoEvent(event_data, event_type)
                 self.events.append(event)
+
+            # Only advance the ETag once every event was parsed, otherwise
+            # the next run would get 304 and the failed events would be lost
+            self.etag = conn.headers.get("ETag", etag)
             
             logger.info(f"Fetched {len(self.events)} events for {self.full_repo_name}")
             return self.events
@@ -168,7 +299,7 @@ class GithubRepoMonitor:
         return summary
 
 
-def monitor_github_repo(repo_owner, repo_name, since_time=None, monitored_events=None):
+def monitor_github_repo(repo_owner, repo_name, since_time=None, monitored_events=None, etag=None):
     """
     Monitor a GitHub repository and return new events
     
@@ -177,12 +308,93 @@ def monitor_github_repo(repo_owner, repo_name, since_time=None, monitored_events
         repo_name: GitHub repository name
         since_time: Only fetch events after this time
         monitored_events: List of event types to monitor
+        etag: ETag of the previous response for a conditional request
     
     Returns:
         List of GithubRepoEvent objects
     """
     monitor = GithubRepoMonitor(repo_owner, repo_name, monitored_events)
-    return monitor.fetch_events(since_time)
+    return monitor.fetch_events(since_time, etag=etag)
+
+
+def monitor_github_repos_batch(specs, since_time=None, monitored_events=None, max_workers=8):
+    """
+    Monitor several GitHub repositories concurrently
+
+    Library helper for callers that check many repositories in one
+    process, e.g. scripts or tests. The scheduler does not use it: each
+    repo scheduler still runs as its own Celery task, and that path only
+    benefits from the shared rate limit throttling.
+
+    Args:
+        specs: List of (repo_owner, repo_name) tuples
+        since_time: Only fetch events after this time
+        monitored_events: List of event types to monitor
+        max_workers: Maximum number of concurrent requests
+
+    Returns:
+        Dict mapping "owner/name" to a list of GithubRepoEvent objects
+    """
+    results = {}
+    if not specs:
+        return results
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for repo_owner, repo_name in specs:
+            future = executor.submit(monitor_github_repo, repo_owner, repo_name,
+                                     since_time, monitored_events)
+            futures[f"{repo_owner}/{repo_name}"] = future
+
+        for full_repo_name, future in futures.items():
+            results[full_repo_name] = future.result()
+
+    return results
+
+
+def persist_events(events, extra_fields=None):
+    """
+    Save new events to the github_repo_event collection
+
+    Events are written with one unordered insert_many; the unique
+    (github_repo_scheduler_id, event_id) index rejects the ones already
+    stored, so no existence check is needed.
+
+    Args:
+        events: List of GithubRepoEvent objects
+        extra_fields: Fields added to every document, e.g. the scheduler and task ID
+
+    Returns:
+        Number of events inserted
+    """
+    if not events:
+        return 0
+
+    extra_fields = extra_fields or {}
+    items = []
+    for event in events:
+        item = event.to_dict()
+        item.update(extra_fields)
+        items.append(item)
+
+    try:
+        result = conn_db("github_repo_event").insert_many(items, ordered=False)
+        return len(result.inserted_ids)
+    except BulkWriteError as e:
+        write_errors = e.details.get("writeErrors", [])
+        if any(error.get("code") != DUPLICATE_KEY_ERROR for error in write_errors):
+            raise
+
+        logger.info(f"Skipped {len(write_errors)} already stored events")
+        return e.details.get("nInserted", 0)
+
+
+DINGTALK_HEADER_TEMPLATE = (
+    "### GitHub 仓库监控\n\n"
+    "**仓库**: [{owner}/{name}](https://github.com/{owner}/{name})\n\n"
+    "**事件数量**: {n}\n\n"
+    "---\n\n"
+)
 
 
 def format_events_for_dingtalk(repo_owner, repo_name, events):
@@ -199,33 +411,31 @@ def format_events_for_dingtalk(repo_owner, repo_name, events):
     """
     if not events:
         return f"### GitHub 仓库监控 - {repo_owner}/{repo_name}\n\n暂无新事件"
-    
-    markdown = f"### GitHub 仓库监控\n\n"
-    markdown += f"**仓库**: [{repo_owner}/{repo_name}](https://github.com/{repo_owner}/{repo_name})\n\n"
-    markdown += f"**事件数量**: {len(events)}\n\n"
-    markdown += "---\n\n"
-    
+
+    parts = [DINGTALK_HEADER_TEMPLATE.format(owner=repo_owner, name=repo_name, n=len(events))]
+
     for idx, event in enumerate(events[:10], 1):  # Limit to 10 events
-        markdown += f"**{idx}. {event.event_type}**\n\n"
-        markdown += f"- **操作者**: {event.actor}\n"
-        markdown += f"- **时间**: {event.created_at}\n"
-        markdown += f"- **详情**: {event.get_summary()}\n\n"
-        
+        parts.append(
+            f"**{idx}. {event.event_type}**\n\n"
+            f"- **操作者**: {event.actor}\n"
+            f"- **时间**: {event.created_at}\n"
+            f"- **详情**: {event.get_summary()}\n\n"
+        )
+
         # Add specific details based on event type
-        if event.event_type == 'PushEvent' and hasattr(event, 'commits'):
-            if event.commits:
-                commit = event.commits[0]
-                markdown += f"- **提交信息**: {commit.get('message', 'N/A')[:100]}\n"
-        elif event.event_type == 'IssuesEvent' and hasattr(event, 'issue'):
-            markdown += f"- **Issue链接**: {event.issue.get('html_url', 'N/A')}\n"
-        elif event.event_type == 'PullRequestEvent' and hasattr(event, 'pull_request'):
-            markdown += f"- **PR链接**: {event.pull_request.get('html_url', 'N/A')}\n"
-        elif event.event_type == 'ReleaseEvent' and hasattr(event, 'release'):
-            markdown += f"- **Release链接**: {event.release.get('html_url', 'N/A')}\n"
-        
-        markdown += "\n"
-    
+        event_type = event.event_type
+        if event_type == 'PushEvent' and event.commit_msg is not None:
+            parts.append(f"- **提交信息**: {event.commit_msg[:100]}\n")
+        elif event_type == 'IssuesEvent':
+            parts.append(f"- **Issue链接**: {event.issue_url}\n")
+        elif event_type == 'PullRequestEvent':
+            parts.append(f"- **PR链接**: {event.pr_url}\n")
+        elif event_type == 'ReleaseEvent':
+            parts.append(f"- **Release链接**: {event.release_url}\n")
+
+        parts.append("\n")
+
     if len(events) > 10:
-        markdown += f"\n... 还有 {len(events) - 10} 个事件未显示\n"
-    
-    return markdown
+        parts.append(f"\n... 还有 {len(events) - 10} 个事件未显示\n")
+
+    return "".join(parts)
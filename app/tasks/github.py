@@ -1,7 +1,10 @@
+import re
+from collections import defaultdict
 from bson import ObjectId
+from pymongo.errors import BulkWriteError
 from app.services import github_search
 from app.services.githubSearch import GithubResult
-from app.services.github_repo_monitor import monitor_github_repo
+from app.services.github_repo_monitor import GithubRepoMonitor, persist_events, DUPLICATE_KEY_ERROR
 from app.services.dingtalk_webhook import send_github_event_notification
 from app.modules import TaskStatus
 from app import utils
@@ -9,8 +12,75 @@ from app.config import Config
 from app.utils import push
 from datetime import datetime, timedelta
 
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
 logger = utils.get_logger()
 
+# 过滤掉的结果路径和内容关键字
+PATH_KEYWORD_LIST = ["open-app-filter/", "/adbyby",
+                     "/adblock", "luci-app-dnsfilter/",
+                     "Spider/", "/spider", "_files/",
+                     "alexa_10k.json", "/WeWorkProviderTest.php"]
+
+CONTENT_KEYWORD_LIST = ["DOMAIN-SUFFIX", "HOST-SUFFIX", "name:[proto;sport;dport;host",
+                        '  "websites": [',
+                        "import android.app.Application;",
+                        "import android.app.Activity;"]
+
+# 邮件报告中代码内容的转义表
+_HTML_TABLE = str.maketrans({"<": "&#x3c;", ">": "&#x3e;", "&": "&amp;"})
+
+# 邮件报告的表格模板
+REPORT_TABLE_START = '''<table style="border-collapse: collapse;">
+            <thead>
+                <tr>
+                    <th style="border: 0.5pt solid; padding:14px;">编号</th>
+                    <th style="border: 0.5pt solid; padding:14px;">文件名</th>
+                    <th style="border: 0.5pt solid; padding:14px;">代码</th>
+                    <th style="border: 0.5pt solid; padding:14px;">Commit 时间</th>
+                </tr>
+            </thead>
+            <tbody>\n'''
+
+REPORT_TABLE_END = '</tbody></table></div>'
+
+REPORT_TD_STYLE = 'style="border: 0.5pt solid; font-size: 14px; padding:14px"'
+
+REPORT_TR_TEMPLATE = ('<tr>'
+                      '<td {style}> {{}} </td>'
+                      '<td {style}> <div style="width: 300px"> <a href="{{}}"> {{}} </a> </div> </td>'
+                      '<td {style}> <pre style="max-width: 600px; overflow: auto; max-height: 600px;">{{}}</pre></td>'
+                      '<td {style}> {{}} </td>'
+                      '</tr>\n').format(style=REPORT_TD_STYLE)
+
+
+def build_keyword_search(keyword_list):
+    """
+    构建多关键字匹配函数，文本只需扫描一遍
+    安装了 pyahocorasick 时使用 Aho-Corasick 自动机，否则合并成一个正则
+    """
+    if ahocorasick is None:
+        return re.compile("|".join(map(re.escape, keyword_list))).search
+
+    automaton = ahocorasick.Automaton()
+    for keyword in keyword_list:
+        automaton.add_word(keyword, keyword)
+    automaton.make_automaton()
+
+    def search(text):
+        for _ in automaton.iter(text):
+            return True
+        return False
+
+    return search
+
+
+_path_keyword_search = build_keyword_search(PATH_KEYWORD_LIST)
+_content_keyword_search = build_keyword_search(CONTENT_KEYWORD_LIST)
+
 
 class GithubTaskTask(object):
     def __init__(self, task_id, keyword):
@@ -18,6 +88,11 @@ class GithubTaskTask(object):
         self.keyword = keyword
         self.collection = "github_task"
         self.results = []
+        # 构造时解析一次，后续更新直接复用
+        self._oid = ObjectId(task_id)
+        self._filter = {"_id": self._oid}
+        self._coll = utils.conn_db(self.collection)
+        self._result_coll = utils.conn_db("github_result")
 
     def search_result(self):
         self.update_status("search")
@@ -26,6 +101,7 @@ class GithubTaskTask(object):
 
     def save_content(self):
         self.update_status("fetch content-{}".format(len(self.results)))
+        items = []
         for result in self.results:
             if not isinstance(result, GithubResult):
                 continue
@@ -33,9 +109,10 @@ class GithubTaskTask(object):
             if self.filter_result(result):
                 continue
 
-            item = self.result_to_dict(result)
+            items.append(self.result_to_dict(result))
 
-            utils.conn_db("github_result").insert_one(item)
+        if items:
+            self._result_coll.insert_many(items, ordered=False)
 
     def result_to_dict(self, result):
         item = result.to_dict()
@@ -45,51 +122,39 @@ class GithubTaskTask(object):
         return item
 
     def filter_result(self, result: GithubResult):
-        path_keyword_list = ["open-app-filter/", "/adbyby",
-                             "/adblock", "luci-app-dnsfilter/",
-                             "Spider/", "/spider", "_files/",
-                             "alexa_10k.json", "/WeWorkProviderTest.php"]
-        for path in path_keyword_list:
-            if path in result.path:
-                return True
+        if _path_keyword_search(result.path):
+            return True
 
-        content_keyword_list = ["DOMAIN-SUFFIX", "HOST-SUFFIX", "name:[proto;sport;dport;host",
-                                '  "websites": [',
-                                "import android.app.Application;",
-                                "import android.app.Activity;"]
-        for keyword in content_keyword_list:
-            if keyword in result.content:
-                return True
+        if _content_keyword_search(result.content):
+            return True
 
         return False
 
+    # 多个字段合并成一次更新
+    def _set_fields(self, **kwargs):
+        self._coll.update_one(self._filter, {"$set": kwargs})
+
     def update_status(self, value):
-        query = {"_id": ObjectId(self.task_id)}
-        update = {"$set": {"status": value}}
-        utils.conn_db(self.collection).update_one(query, update)
+        self._set_fields(status=value)
 
     def set_start_time(self):
-        query = {"_id": ObjectId(self.task_id)}
-        update = {"$set": {"start_time": utils.curr_date()}}
-        utils.conn_db(self.collection).update_one(query, update)
+        self._set_fields(start_time=utils.curr_date())
 
     def set_end_time(self):
-        query = {"_id": ObjectId(self.task_id)}
-        update = {"$set": {"end_time": utils.curr_date()}}
-        utils.conn_db(self.collection).update_one(query, update)
+        self._set_fields(end_time=utils.curr_date())
+
+    def set_error(self):
+        self._set_fields(status=TaskStatus.ERROR, end_time=utils.curr_date())
 
     def statistic(self):
-        query = {"_id": ObjectId(self.task_id)}
-        table_list = ['github_result']
-        result = {}
-        for table in table_list:
-            cnt = utils.conn_db(table).count_documents({"github_task_id": self.task_id})
-            stat_key = table + "_cnt"
-            result[stat_key] = cnt
+        cnt = self._result_coll.count_documents({"github_task_id": self.task_id})
+        return {"github_result_cnt": cnt}
 
+    # 统计结果、状态和结束时间一次写入
+    def set_done(self):
         logger.info("insert task stat")
-        update = {"$set": {"statistic": result}}
-        utils.conn_db(self.collection).update_one(query, update)
+        self._set_fields(statistic=self.statistic(), status=TaskStatus.DONE,
+                         end_time=utils.curr_date())
 
     def run(self):
         self.set_start_time()
@@ -97,122 +162,129 @@ class GithubTaskTask(object):
         self.search_result()
         self.save_content()
 
-        self.update_status(TaskStatus.DONE)
-        self.statistic()
-        self.set_end_time()
+        self.set_done()
 
 
 class GithubTaskMonitor(GithubTaskTask):
     def __init__(self, task_id, keyword, scheduler_id):
         super().__init__(task_id, keyword)
         self.scheduler_id = scheduler_id
-        self.hash_md5_list = []
+        self.hash_md5_seen = set()
         self.new_results = []  # 保存过滤后的结果
+        self._repo_map = None
+        self._hash_coll = utils.conn_db("github_hash")
+        self._monitor_coll = utils.conn_db("github_monitor_result")
 
     def init_md5_list(self):
         query = {"github_scheduler_id": self.scheduler_id}
-        results = list(utils.conn_db("github_hash").find(query, {"hash_md5": 1}))
-        for result in results:
-            if result["hash_md5"] not in self.hash_md5_list:
-                self.hash_md5_list.append(result["hash_md5"])
+        # 直接迭代游标，避免一次性把历史 hash 全部加载到内存
+        cursor = self._hash_coll.find(query, {"hash_md5": 1, "_id": 0}).batch_size(5000)
+        self.hash_md5_seen.update(result["hash_md5"] for result in cursor)
 
     def save_mongo(self):
         cnt = 0
         self.update_status("fetch content")
+        hash_items = []
+        monitor_items = []
+        result_items = []
+        # 同一批结果使用相同的更新时间
+        update_date = utils.curr_date_obj()
         for result in self.results:
             if not isinstance(result, GithubResult):
                 continue
 
-            if result.hash_md5 in self.hash_md5_list:
+            if result.hash_md5 in self.hash_md5_seen:
                 continue
 
             # 保存md5, 直接在过滤前，避免重复过滤
-            self.hash_md5_list.append(result.hash_md5)
+            self.hash_md5_seen.add(result.hash_md5)
             hash_data = {"hash_md5": result.hash_md5, "github_scheduler_id": self.scheduler_id}
-            utils.conn_db("github_hash").insert_one(hash_data)
+            hash_items.append(hash_data)
 
             if self.filter_result(result):
                 continue
 
+            # 监控结果和任务结果在同一次循环中构建
             item = self.result_to_dict(result)
-            item["github_scheduler_id"] = self.scheduler_id
-            item["update_date"] = utils.curr_date_obj()
+            monitor_item = dict(item)
+            monitor_item["github_scheduler_id"] = self.scheduler_id
+            monitor_item["update_date"] = update_date
             cnt += 1
             self.new_results.append(result)
-            utils.conn_db("github_monitor_result").insert_one(item)
+            monitor_items.append(monitor_item)
+            result_items.append(item)
+
+        # 批量写入，减少与 mongo 的交互次数
+        # 先写结果，hash 写入失败也不会丢结果
+        if monitor_items:
+            self._monitor_coll.insert_many(monitor_items, ordered=False)
+
+        if result_items:
+            self._result_coll.insert_many(result_items, ordered=False)
+
+        if hash_items:
+            self.save_hash(hash_items)
 
         logger.info("github_monitor save {} {}".format(self.keyword, cnt))
 
+    # 同一监控的任务并发运行时 hash 可能已被写入，唯一索引冲突直接忽略
+    def save_hash(self, hash_items):
+        try:
+            self._hash_coll.insert_many(hash_items, ordered=False)
+        except BulkWriteError as e:
+            write_errors = e.details.get("writeErrors", [])
+            if any(error.get("code") != DUPLICATE_KEY_ERROR for error in write_errors):
+                raise
+
+            logger.info("github_monitor skip {} saved hash".format(len(write_errors)))
+
+    # 邮件和钉钉报告共用，只构建一次
     def build_repo_map(self):
-        repo_map = dict()
-        for result in self.new_results:
-            repo_name = result.repo_full_name
-            if repo_map.get(repo_name) is None:
-                repo_map[repo_name] = [result]
-            else:
-                repo_map[repo_name].append(result)
+        if self._repo_map is None:
+            repo_map = defaultdict(list)
+            for result in self.new_results:
+                repo_map[result.repo_full_name].append(result)
+
+            self._repo_map = repo_map
 
-        return repo_map
+        return self._repo_map
 
     def build_html_report(self):
         repo_map = self.build_repo_map()
         repo_cnt = 0
-        html = "<br/><br/> <div> 搜索: {}  仓库数：{}  结果数： {} </div>".format(self.keyword,
-                                                                        len(repo_map.keys()), len(self.new_results))
+        parts = ["<br/><br/> <div> 搜索: {}  仓库数：{}  结果数： {} </div>".format(self.keyword,
+                                                                          len(repo_map), len(self.new_results))]
         for repo_name in repo_map:
             repo_cnt += 1
             # 为了较少长度，超过 5 个仓库就跳过
             if repo_cnt > 5:
                 break
 
+            items = repo_map[repo_name]
             start_div = '<br/><br/><br/><div>#{} <a href="https://github.com/{}"> {} </a> 结果数：{}</div><br/>\n'.format(
-                repo_cnt, repo_name, repo_name, len(repo_map[repo_name]))
-            table_start = '''<table style="border-collapse: collapse;">
-            <thead>
-                <tr>
-                    <th style="border: 0.5pt solid; padding:14px;">编号</th>
-                    <th style="border: 0.5pt solid; padding:14px;">文件名</th>
-                    <th style="border: 0.5pt solid; padding:14px;">代码</th>
-                    <th style="border: 0.5pt solid; padding:14px;">Commit 时间</th>
-                </tr>
-            </thead>
-            <tbody>\n'''
-            html += start_div
-            html += table_start
+                repo_cnt, repo_name, repo_name, len(items))
+            parts.append(start_div)
+            parts.append(REPORT_TABLE_START)
 
-            style = 'style="border: 0.5pt solid; font-size: 14px; padding:14px"'
             tr_cnt = 0
-            for item in repo_map[repo_name]:
+            for item in items:
                 tr_cnt += 1
-                code_content = item.human_content(self.keyword).replace('>', "&#x3e;").replace('<', "&#x3c;")
-                code_content = code_content[:2000]
-                tr_tag = '<tr>' \
-                         '<td {}> {} </td>' \
-                         '<td {}> <div style="width: 300px"> <a href="{}"> {} </a> </div> </td>' \
-                         '<td {}> <pre style="max-width: 600px; overflow: auto; max-height: 600px;">{}</pre></td>' \
-                         '<td {}> {} </td>' \
-                         '</tr>\n'.format(
-                    style, tr_cnt, style, item.html_url, item.path,
-                    style, code_content,
-                    style, item.commit_date)
-
-                html += tr_tag
+                # 先截断再转义，避免处理整个文件内容
+                code_content = item.human_content(self.keyword)[:2000].translate(_HTML_TABLE)
+                parts.append(REPORT_TR_TEMPLATE.format(tr_cnt, item.html_url, item.path,
+                                                       code_content, item.commit_date))
                 if tr_cnt > 10:
                     break
 
-            table_end = '</tbody></table>'
-            end_div = "</div>"
+            parts.append(REPORT_TABLE_END)
 
-            html += table_end
-            html += end_div
-
-        return html
+        return "".join(parts)
 
     def build_markdown_report(self):
         repo_map = self.build_repo_map()
 
-        markdown = "[监控-Github-{}] \n 仓库数:{}  结果数:{} \n --- \n".format(self.keyword,
-                                                                        len(repo_map.keys()), len(self.new_results))
+        parts = ["[监控-Github-{}] \n 仓库数:{}  结果数:{} \n --- \n".format(self.keyword,
+                                                                          len(repo_map), len(self.new_results))]
 
         global_cnt = 0
         repo_cnt = 0
@@ -227,11 +299,11 @@ class GithubTaskMonitor(GithubTaskTask):
                 tr_cnt += 1
                 global_cnt += 1
                 url_text = item.repo_full_name + " " + item.path
-                markdown += "{}. [{}]({})  \n".format(global_cnt, url_text, item.html_url)
+                parts.append("{}. [{}]({})  \n".format(global_cnt, url_text, item.html_url))
                 if tr_cnt > 5:
                     break
 
-        return markdown
+        return "".join(parts)
 
     # 消息推送
     def push_msg(self):
@@ -277,19 +349,13 @@ class GithubTaskMonitor(GithubTaskTask):
         # 根据关键字搜索出结果
         self.search_result()
 
-        # 保存到监控结果
+        # 保存到监控结果和任务结果
         self.save_mongo()
 
-        # 保存到任务结果
-        self.results = self.new_results
-        self.save_content()
-
         self.push_msg()
 
         # 保存统计结果
-        self.statistic()
-        self.update_status(TaskStatus.DONE)
-        self.set_end_time()
+        self.set_done()
 
 
 # Github 普通任务
@@ -298,16 +364,14 @@ def github_task_task(task_id, keyword):
     try:
         if not Config.GITHUB_TOKEN:
             logger.error("GITHUB_TOKEN is empty")
-            task.update_status(TaskStatus.ERROR)
-            task.set_end_time()
+            task.set_error()
             return
 
         task.run()
     except Exception as e:
         logger.exception(e)
 
-        task.update_status(TaskStatus.ERROR)
-        task.set_end_time()
+        task.set_error()
 
 
 # Github 监控任务
@@ -319,8 +383,7 @@ def github_task_monitor(task_id, keyword, scheduler_id):
     except Exception as e:
         logger.exception(e)
 
-        task.update_status(TaskStatus.ERROR)
-        task.set_end_time()
+        task.set_error()
 
 
 class GithubRepoMonitorTask(object):
@@ -333,21 +396,29 @@ class GithubRepoMonitorTask(object):
         self.scheduler_id = scheduler_id
         self.collection = "github_repo_task"
         self.events = []
+        self.etag = None
+        # Resolve ids and collection handles once instead of per update
+        self._oid = ObjectId(task_id)
+        self._filter = {"_id": self._oid}
+        self._coll = utils.conn_db(self.collection)
+        self._scheduler_filter = {"_id": ObjectId(scheduler_id)}
+        self._scheduler_coll = utils.conn_db("github_repo_scheduler")
+
+    def _set_fields(self, **kwargs):
+        """Set several task fields in a single update"""
+        self._coll.update_one(self._filter, {"$set": kwargs})
     
     def update_status(self, value):
-        query = {"_id": ObjectId(self.task_id)}
-        update = {"$set": {"status": value}}
-        utils.conn_db(self.collection).update_one(query, update)
+        self._set_fields(status=value)
     
     def set_start_time(self):
-        query = {"_id": ObjectId(self.task_id)}
-        update = {"$set": {"start_time": utils.curr_date()}}
-        utils.conn_db(self.collection).update_one(query, update)
+        self._set_fields(start_time=utils.curr_date())
     
     def set_end_time(self):
-        query = {"_id": ObjectId(self.task_id)}
-        update = {"$set": {"end_time": utils.curr_date()}}
-        utils.conn_db(self.collection).update_one(query, update)
+        self._set_fields(end_time=utils.curr_date())
+
+    def set_error(self):
+        self._set_fields(status=TaskStatus.ERROR, end_time=utils.curr_date())
     
     def get_last_check_time(self):
         """Get the last check time from previous task run"""
@@ -355,8 +426,11 @@ class GithubRepoMonitorTask(object):
             "github_repo_scheduler_id": self.scheduler_id,
             "status": TaskStatus.DONE
         }
-        last_task = utils.conn_db(self.collection).find_one(
-            query, 
+        # Only end_time is needed; the sort is served by the
+        # (github_repo_scheduler_id, status, end_time) index
+        last_task = self._coll.find_one(
+            query,
+            {"end_time": 1, "_id": 0},
             sort=[("end_time", -1)]
         )
         if last_task and last_task.get("end_time"):
@@ -364,12 +438,26 @@ class GithubRepoMonitorTask(object):
             try:
                 last_time = utils.parse_datetime(last_task["end_time"])
                 return last_time
-            except:
+            except (ValueError, TypeError):
                 pass
         
         # Default to 1 hour ago
         return datetime.now() - timedelta(hours=1)
     
+    def get_last_etag(self):
+        """Get the ETag of the events feed stored on the scheduler"""
+        item = self._scheduler_coll.find_one(self._scheduler_filter, {"events_etag": 1})
+        if item:
+            return item.get("events_etag")
+
+    def save_etag(self):
+        """Store the new ETag on the scheduler once events are saved"""
+        if not self.etag:
+            return
+
+        update = {"$set": {"events_etag": self.etag}}
+        self._scheduler_coll.update_one(self._scheduler_filter, update)
+
     def fetch_events(self):
         """Fetch GitHub repository events"""
         self.update_status("fetching events")
@@ -378,11 +466,11 @@ class GithubRepoMonitorTask(object):
             last_check_time = self.get_last_check_time()
             logger.info(f"Checking GitHub events for {self.repo_owner}/{self.repo_name} since {last_check_time}")
             
-            self.events = monitor_github_repo(
-                self.repo_owner, 
-                self.repo_name, 
-                since_time=last_check_time
-            )
+            last_etag = self.get_last_etag()
+            monitor = GithubRepoMonitor(self.repo_owner, self.repo_name)
+            self.events = monitor.fetch_events(since_time=last_check_time, etag=last_etag)
+            if monitor.etag != last_etag:
+                self.etag = monitor.etag
             
             logger.info(f"Found {len(self.events)} new events for {self.repo_owner}/{self.repo_name}")
         except Exception as e:
@@ -392,20 +480,12 @@ class GithubRepoMonitorTask(object):
         """Save events to database"""
         self.update_status(f"saving {len(self.events)} events")
         
-        for event in self.events:
-            event_data = event.to_dict()
-            event_data["github_repo_scheduler_id"] = self.scheduler_id
-            event_data["github_repo_task_id"] = self.task_id
-            event_data["saved_at"] = utils.curr_date_obj()
-            
-            # Check if event already exists
-            existing = utils.conn_db("github_repo_event").find_one({
-                "event_id": event.event_id,
-                "github_repo_scheduler_id": self.scheduler_id
-            })
-            
-            if not existing:
-                utils.conn_db("github_repo_event").insert_one(event_data)
+        extra_fields = {
+            "github_repo_scheduler_id": self.scheduler_id,
+            "github_repo_task_id": self.task_id,
+            "saved_at": utils.curr_date_obj()
+        }
+        persist_events(self.events, extra_fields)
     
     def send_notification(self):
         """Send DingTalk notification for new events"""
@@ -441,13 +521,15 @@ class GithubRepoMonitorTask(object):
             logger.exception(f"Error sending notification: {e}")
     
     def statistic(self):
-        """Update task statistics"""
-        query = {"_id": ObjectId(self.task_id)}
-        result = {
+        """Build task statistics"""
+        return {
             "event_count": len(self.events)
         }
-        update = {"$set": {"statistic": result}}
-        utils.conn_db(self.collection).update_one(query, update)
+
+    def set_done(self):
+        """Write statistics, DONE status and end time in a single update"""
+        self._set_fields(statistic=self.statistic(), status=TaskStatus.DONE,
+                         end_time=utils.curr_date())
     
     def run(self):
         """Run the monitoring task"""
@@ -459,21 +541,17 @@ class GithubRepoMonitorTask(object):
             
             # Save events to database
             self.save_events()
+            self.save_etag()
             
             # Send DingTalk notification
             self.send_notification()
             
-            # Update statistics
-            self.statistic()
-            
-            self.update_status(TaskStatus.DONE)
+            # Update statistics, status and end time
+            self.set_done()
             
         except Exception as e:
             logger.exception(f"Error in GitHub repo monitor task: {e}")
-            self.update_status(TaskStatus.ERROR)
-        
-        finally:
-            self.set_end_time()
+            self.set_error()
 
 
 # GitHub repository monitoring task
@@ -489,13 +567,11 @@ def github_repo_monitor_task(task_id, repo_owner, repo_name, scheduler_id):
     try:
         if not Config.GITHUB_TOKEN:
             logger.error("GITHUB_TOKEN is not configured")
-            task.update_status(TaskStatus.ERROR)
-            task.set_end_time()
+            task.set_error()
             return
         
         task.run()
         
     except Exception as e:
         logger.exception(e)
-        task.update_status(TaskStatus.ERROR)
-        task.set_end_time()
+        task.set_error()
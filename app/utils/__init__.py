@@ -12,7 +12,7 @@ import colorlog
 import logging
 import dns.resolver
 from tld import get_tld
-from .conn import http_req, conn_db
+from .conn import http_req, conn_db, new_session, json_loads, json_dumps
 from .http import get_title, get_headers
 from .domain import check_domain_black, is_valid_domain, is_in_scope, is_in_scopes, is_valid_fuzz_domain
 from .ip import is_vaild_ip_target, not_in_black_ips, get_ip_asn, get_ip_city, get_ip_type
@@ -23,7 +23,7 @@ from .cert import get_cert
 from .arlupdate import arl_update
 from .cdn import get_cdn_name_by_cname, get_cdn_name_by_ip
 from .device import device_info
-from .cron import check_cron, check_cron_interval
+from .cron import check_cron, check_cron_interval, check_cron_next, parse_cron, run_due_schedulers
 from .query_loader import load_query_plugins
 import re
 
@@ -1,6 +1,7 @@
 import sys
 import os
 import threading
+from pymongo.errors import OperationFailure
 from . import conn_db
 from app.config import Config
 
@@ -34,6 +35,8 @@ def create_index():
         "github_result": "github_task_id",
         "github_monitor_result": "github_scheduler_id",
         "wih": ["task_id", "record_type", "fnv_hash"],
+        "github_repo_scheduler": [[("repo_owner", 1), ("repo_name", 1), ("status", 1)], "name"],
+        "github_repo_task": [[("github_repo_scheduler_id", 1), ("status", 1), ("end_time", -1)]],
     }
     for table in index_map:
         if isinstance(index_map[table], list):
@@ -42,6 +45,20 @@ def create_index():
         else:
             conn_db(table).create_index(index_map[table])
 
+    # 唯一索引，同时用于去重
+    unique_index_map = {
+        "github_repo_event": [("github_repo_scheduler_id", 1), ("event_id", 1)],
+        "github_hash": [("github_scheduler_id", 1), ("hash_md5", 1)],
+    }
+    for table in unique_index_map:
+        try:
+            conn_db(table).create_index(unique_index_map[table], unique=True)
+        except OperationFailure as e:
+            # 历史数据存在重复时无法建唯一索引，退回普通索引
+            from app.utils import get_logger
+            get_logger().warning("create unique index on {} failed: {}".format(table, e))
+            conn_db(table).create_index(unique_index_map[table])
+
 
 def arl_update():
     if is_run_flask_routes():
@@ -49,7 +66,8 @@ def arl_update():
 
     npoc_info_update()
 
-    update_lock = os.path.join(Config.TMP_PATH, 'arl_update.lock')
+    # 新增索引时修改锁文件名，已部署的环境会再执行一次
+    update_lock = os.path.join(Config.TMP_PATH, 'arl_update_v2.lock')
     if os.path.exists(update_lock):
         return
 
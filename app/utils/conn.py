@@ -1,10 +1,17 @@
 import urllib3
 import time
+import json
 import requests
+from requests.adapters import HTTPAdapter
 from app.config import Config
 from pymongo import MongoClient
 from requests.exceptions import ReadTimeout
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 
@@ -46,7 +53,16 @@ def patch_content(response, timeout=None):
     return response._content
 
 
-def http_req(url, method='get', **kwargs):
+def new_session(pool_connections=10, pool_maxsize=20):
+    """创建带连接池的 Session，复用 TCP/TLS 连接"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def http_req(url, method='get', session=None, **kwargs):
     kwargs.setdefault('verify', False)
     kwargs.setdefault('timeout', (10.1, 30.1))
     kwargs.setdefault('allow_redirects', False)
@@ -64,7 +80,9 @@ def http_req(url, method='get', **kwargs):
         proxies['http'] = Config.PROXY_URL
         kwargs["proxies"] = proxies
 
-    conn = getattr(requests, method)(url, **kwargs)
+    # 传入 session 时复用其连接池
+    requester = session or requests
+    conn = getattr(requester, method)(url, **kwargs)
 
     timeout = kwargs.get("timeout")
     if len(timeout) > 1 and timeout[1]:
@@ -75,6 +93,22 @@ def http_req(url, method='get', **kwargs):
     return conn
 
 
+def json_loads(data):
+    """解析 JSON，安装了 orjson 时使用 orjson"""
+    if orjson is not None:
+        return orjson.loads(data)
+
+    return json.loads(data)
+
+
+def json_dumps(obj):
+    """序列化为 UTF-8 编码的 JSON bytes，安装了 orjson 时使用 orjson"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
 class ConnMongo(object):
     def __new__(self):
         if not hasattr(self, 'instance'):
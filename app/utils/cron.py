@@ -1,10 +1,18 @@
 from crontab import CronTab
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import time
 
 
+@lru_cache(maxsize=1024)
+def parse_cron(cron):
+    """解析 cron 表达式，相同表达式只解析一次"""
+    return CronTab(cron)
+
+
 def check_cron(cron):
     try:
-        entry = CronTab(cron)
+        entry = parse_cron(cron)
         previous = entry.previous(default_utc=False)
         next_sec = entry.next(default_utc=False)
         next_next_sec = entry.next(default_utc=False, now=time.time() + next_sec)
@@ -15,12 +23,39 @@ def check_cron(cron):
 
 min_interval = 60 * 60 * 6
 
+# 调度检查的并发数，单个检查主要耗时在 mongo 和 celery 的网络交互
+scheduler_max_workers = 16
+
+
+def run_due_schedulers(items, check_fn, max_workers=scheduler_max_workers):
+    """并发对每个调度项调用 check_fn，由 check_fn 判断是否到期并下发任务"""
+    if not items:
+        return
+
+    max_workers = min(max_workers, len(items))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(check_fn, items))
+
 
 def check_cron_interval(cron):
+    check_flag, msg, _ = check_cron_next(cron)
+    return check_flag, msg
+
+
+def check_cron_next(cron):
+    """
+    校验 cron 表达式的间隔，同时返回距离下次运行的秒数
+    :return: (check_flag, msg, next_sec)
+    """
+    previous, next_sec, next_next_sec = check_cron(cron)
+    check_flag, msg = _check_interval(previous, next_sec, next_next_sec)
+    return check_flag, msg, next_sec
+
+
+def _check_interval(previous, next_sec, next_next_sec):
     from app import utils
     from app.modules import ErrorMsg
 
-    previous, next_sec, next_next_sec = check_cron(cron)
     if isinstance(previous, str):
         return False, utils.build_ret(ErrorMsg.CronError, data={"error": previous})
 
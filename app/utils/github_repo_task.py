@@ -1,6 +1,7 @@
 import time
-from crontab import CronTab
+from concurrent.futures import ThreadPoolExecutor
 from bson import ObjectId
+from pymongo import UpdateOne
 from app.modules import CeleryAction, SchedulerStatus, TaskStatus
 from app import celerytask, utils
 
@@ -70,17 +71,48 @@ def github_repo_cron_run(item):
     # Submit scheduled monitoring task
     submit_github_repo_task(task_data=task_data)
     
-    # Update scheduler
-    item["run_number"] = item["run_number"] + 1
-    item["last_run_date"] = utils.curr_date()
-    item["last_run_time"] = int(time.time())
-    entry = CronTab(item["cron"])
+    # Update scheduler, only the changed fields are sent
+    entry = utils.parse_cron(item["cron"])
     now_time = time.time() + 61
     next_sec = entry.next(now=now_time, default_utc=False)
-    item["next_run_date"] = utils.time2date(now_time + next_sec - 60)
-    
+    update = {
+        "$inc": {"run_number": 1},
+        "$set": {
+            "last_run_date": utils.curr_date(),
+            "last_run_time": int(time.time()),
+            "next_run_date": utils.time2date(now_time + next_sec - 60)
+        }
+    }
+
     query = {"_id": item["_id"]}
-    utils.conn_db('github_repo_scheduler').find_one_and_replace(query, item)
+    utils.conn_db('github_repo_scheduler').update_one(query, update)
+
+
+def load_active_github_repo_schedulers():
+    """
+    Load running GitHub repository schedulers in one query
+
+    The status filter runs in MongoDB, stopped schedulers are never sent
+    to the scheduler process.
+    """
+    query = {"status": SchedulerStatus.RUNNING}
+    return list(utils.conn_db('github_repo_scheduler').find(query))
+
+
+def _github_repo_scheduler_check(item):
+    """Check a single scheduler item and run it if it is due"""
+    try:
+        entry = utils.parse_cron(item["cron"])
+        next_sec = entry.next(default_utc=False)
+
+        # Check if it's time to run (within next 60 seconds and hasn't run in last 3 minutes)
+        if next_sec < 60 and abs(time.time() - item["last_run_time"]) > 60*3:
+            repo_name = f"{item['repo_owner']}/{item['repo_name']}"
+            logger.info(f"GitHub repo cron run: {repo_name} scheduler_id:{item['_id']}")
+            github_repo_cron_run(item)
+
+    except Exception as e:
+        logger.exception(f"Error in GitHub repo scheduler: {e}")
 
 
 def github_repo_scheduler():
@@ -88,23 +120,7 @@ def github_repo_scheduler():
     GitHub repository monitoring task scheduler
     Called periodically to check and execute scheduled tasks
     """
-    items = list(utils.conn_db('github_repo_scheduler').find())
-    for item in items:
-        try:
-            if item["status"] != SchedulerStatus.RUNNING:
-                continue
-            
-            entry = CronTab(item["cron"])
-            next_sec = entry.next(default_utc=False)
-            
-            # Check if it's time to run (within next 60 seconds and hasn't run in last 3 minutes)
-            if next_sec < 60 and abs(time.time() - item["last_run_time"]) > 60*3:
-                repo_name = f"{item['repo_owner']}/{item['repo_name']}"
-                logger.info(f"GitHub repo cron run: {repo_name} scheduler_id:{item['_id']}")
-                github_repo_cron_run(item)
-                
-        except Exception as e:
-            logger.exception(f"Error in GitHub repo scheduler: {e}")
+    utils.run_due_schedulers(load_active_github_repo_schedulers(), _github_repo_scheduler_check)
 
 
 def find_github_repo_scheduler(_id):
@@ -114,67 +130,128 @@ def find_github_repo_scheduler(_id):
     return item
 
 
-def delete_github_repo_scheduler(_id):
+def find_github_repo_schedulers_by_ids(ids):
     """
-    Delete GitHub repository scheduler and all related data
-    
+    Find GitHub repository schedulers by a list of IDs in one query
+
     Args:
-        _id: Scheduler ID (24-character hex string)
+        ids: List of scheduler IDs
+
+    Returns:
+        Dict mapping scheduler ID (str) to scheduler item
     """
-    if len(_id) != 24:
-        return
-    
-    query = {"_id": ObjectId(_id)}
-    utils.conn_db('github_repo_scheduler').delete_one(query)
-    
-    result_query = {"github_repo_scheduler_id": _id}
-    
-    # Delete GitHub repository events
-    utils.conn_db('github_repo_event').delete_many(result_query)
-    
-    # Delete GitHub repository tasks
-    utils.conn_db('github_repo_task').delete_many(result_query)
+    query = {"_id": {"$in": [ObjectId(_id) for _id in ids]}}
+    items = utils.conn_db('github_repo_scheduler').find(query)
+    return {str(item["_id"]): item for item in items}
 
 
-def recover_github_repo_task(_id):
+def _delete_github_repo_data(scheduler_query, result_query):
     """
-    Recover (resume) a stopped GitHub repository scheduler
-    
+    Delete schedulers with their events and tasks
+
+    The three collections are independent, so the deletes run
+    concurrently instead of as three sequential round trips.
+    """
+    deletes = [
+        ('github_repo_scheduler', scheduler_query),
+        # GitHub repository events
+        ('github_repo_event', result_query),
+        # GitHub repository tasks
+        ('github_repo_task', result_query),
+    ]
+
+    with ThreadPoolExecutor(max_workers=len(deletes)) as executor:
+        futures = [executor.submit(utils.conn_db(name).delete_many, query)
+                   for name, query in deletes]
+        for future in futures:
+            future.result()
+
+
+def delete_github_repo_schedulers(ids):
+    """
+    Delete GitHub repository schedulers and all related data in batch
+
     Args:
-        _id: Scheduler ID
+        ids: List of scheduler IDs (24-character hex strings)
     """
-    if len(_id) != 24:
-        return
-    
-    item = find_github_repo_scheduler(_id)
-    if not item:
+    ids = [_id for _id in ids if len(_id) == 24]
+    if not ids:
         return
-    
-    item["status"] = SchedulerStatus.RUNNING
-    entry = CronTab(item["cron"])
-    next_sec = entry.next(default_utc=False)
-    item["next_run_date"] = utils.time2date(time.time() + next_sec)
-    
-    query = {"_id": ObjectId(_id)}
-    utils.conn_db('github_repo_scheduler').find_one_and_replace(query, item)
 
+    query = {"_id": {"$in": [ObjectId(_id) for _id in ids]}}
+    result_query = {"github_repo_scheduler_id": {"$in": ids}}
+    _delete_github_repo_data(query, result_query)
 
-def stop_github_repo_task(_id):
+
+def _apply_status_updates(operations, ids, status):
     """
-    Stop a running GitHub repository scheduler
-    
+    Run the conditional status updates and return the IDs that changed
+
+    When some updates miss because the status changed concurrently, the
+    schedulers now in the target status are read back, so the caller can
+    report a partial success.
+    """
+    if not operations:
+        return []
+
+    coll = utils.conn_db('github_repo_scheduler')
+    result = coll.bulk_write(operations, ordered=False)
+    if result.matched_count == len(operations):
+        return list(ids)
+
+    query = {"_id": {"$in": [ObjectId(_id) for _id in ids]}, "status": status}
+    changed = {str(item["_id"]) for item in coll.find(query, {"_id": 1})}
+    return [_id for _id in ids if _id in changed]
+
+
+def recover_github_repo_tasks(items):
+    """
+    Recover (resume) stopped GitHub repository schedulers in batch
+
+    Each update only matches a scheduler that is still stopped, so a
+    concurrent status change is not overwritten and the batch can
+    partially succeed.
+
     Args:
-        _id: Scheduler ID
+        items: List of scheduler items from github_repo_scheduler collection
+
+    Returns:
+        List of scheduler IDs that were recovered
     """
-    if len(_id) != 24:
-        return
-    
-    item = find_github_repo_scheduler(_id)
-    if not item:
-        return
-    
-    item["status"] = SchedulerStatus.STOP
-    item["next_run_date"] = "-"
-    
-    query = {"_id": ObjectId(_id)}
-    utils.conn_db('github_repo_scheduler').find_one_and_replace(query, item)
+    operations = []
+    for item in items:
+        entry = utils.parse_cron(item["cron"])
+        next_sec = entry.next(default_utc=False)
+        update = {
+            "status": SchedulerStatus.RUNNING,
+            "next_run_date": utils.time2date(time.time() + next_sec)
+        }
+        query = {"_id": item["_id"], "status": SchedulerStatus.STOP}
+        operations.append(UpdateOne(query, {"$set": update}))
+
+    ids = [str(item["_id"]) for item in items]
+    return _apply_status_updates(operations, ids, SchedulerStatus.RUNNING)
+
+
+def stop_github_repo_tasks(items):
+    """
+    Stop running GitHub repository schedulers in batch
+
+    Each update only matches a scheduler that is still running, so a
+    concurrent status change is not overwritten and the batch can
+    partially succeed.
+
+    Args:
+        items: List of scheduler items from github_repo_scheduler collection
+
+    Returns:
+        List of scheduler IDs that were stopped
+    """
+    update = {"$set": {"status": SchedulerStatus.STOP, "next_run_date": "-"}}
+    operations = []
+    for item in items:
+        query = {"_id": item["_id"], "status": SchedulerStatus.RUNNING}
+        operations.append(UpdateOne(query, update))
+
+    ids = [str(item["_id"]) for item in items]
+    return _apply_status_updates(operations, ids, SchedulerStatus.STOP)
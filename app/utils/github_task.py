@@ -1,5 +1,4 @@
 import time
-from crontab import CronTab
 from bson import ObjectId
 from app.modules import CeleryAction, SchedulerStatus, TaskStatus
 from app import celerytask, utils
@@ -63,7 +62,7 @@ def github_cron_run(item):
     item["run_number"] = item["run_number"] + 1
     item["last_run_date"] = utils.curr_date()
     item["last_run_time"] = int(time.time())
-    entry = CronTab(item["cron"])
+    entry = utils.parse_cron(item["cron"])
     now_time = time.time() + 61
     next_sec = entry.next(now=now_time, default_utc=False)
     item["next_run_date"] = utils.time2date(now_time + next_sec - 60)
@@ -74,22 +73,27 @@ def github_cron_run(item):
     utils.conn_db('github_scheduler').find_one_and_replace(query, item)
 
 
-# Github 监控任务调度，有个循环
-def github_task_scheduler():
-    items = list(utils.conn_db('github_scheduler').find())
-    for item in items:
-        try:
-            if item["status"] != SchedulerStatus.RUNNING:
-                continue
+# 只加载运行中的 Github 监控，状态过滤在 mongo 中完成
+def load_active_github_schedulers():
+    query = {"status": SchedulerStatus.RUNNING}
+    return list(utils.conn_db('github_scheduler').find(query))
+
 
-            entry = CronTab(item["cron"])
-            next_sec = entry.next(default_utc=False)
-            if next_sec < 60 and abs(time.time() - item["last_run_time"]) > 60*3:
-                logger.info("github_cron_run {} {}".format(item["keyword"], str(item["_id"])))
-                github_cron_run(item)
+def _github_scheduler_check(item):
+    try:
+        entry = utils.parse_cron(item["cron"])
+        next_sec = entry.next(default_utc=False)
+        if next_sec < 60 and abs(time.time() - item["last_run_time"]) > 60*3:
+            logger.info("github_cron_run {} {}".format(item["keyword"], str(item["_id"])))
+            github_cron_run(item)
 
-        except Exception as e:
-            logger.exception(e)
+    except Exception as e:
+        logger.exception(e)
+
+
+# Github 监控任务调度，到期的任务并发下发
+def github_task_scheduler():
+    utils.run_due_schedulers(load_active_github_schedulers(), _github_scheduler_check)
 
 
 def find_github_scheduler(_id):
@@ -127,7 +131,7 @@ def recover_task(_id):
 
     item = find_github_scheduler(_id)
     item["status"] = SchedulerStatus.RUNNING
-    entry = CronTab(item["cron"])
+    entry = utils.parse_cron(item["cron"])
     next_sec = entry.next(default_utc=False)
     item["next_run_date"] = utils.time2date(time.time() + next_sec)
 
@@ -6,11 +6,14 @@ import hashlib
 import smtplib, ssl
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
-from app.utils import http_req, get_logger
+from app.utils import http_req, get_logger, new_session
 from app.config import Config
 
 logger = get_logger()
 
+# 推送共用连接池，避免每次推送重新建立 TLS 连接
+_session = new_session()
+
 
 class Push(object):
     """docstring for ClassName"""
@@ -232,7 +235,7 @@ def dict2dingding_mark(info_list):
     return "{}\n{}".format(title_tpl, items_tpl)
 
 
-def dingding_send(msg, access_token, secret, msgtype="text", title="灯塔消息推送"):
+def dingding_send(msg, access_token, secret, msgtype="text", title="灯塔消息推送", session=None):
     ding_url = "https://oapi.dingtalk.com/robot/send?access_token={}".format(access_token)
     timestamp = str(round(time.time() * 1000))
     secret_enc = secret.encode('utf-8')
@@ -252,7 +255,7 @@ def dingding_send(msg, access_token, secret, msgtype="text", title="灯塔消息
             "text": msg
         }
     }
-    conn = http_req(ding_url, method='post', json=send_json)
+    conn = http_req(ding_url, method='post', session=session or _session, json=send_json)
     return conn.json()
 
 
@@ -308,7 +311,7 @@ def dict2table(info_list):
     return html
 
 
-def feishu_send(msg, webhook_url, secret, title="灯塔消息推送"):
+def feishu_send(msg, webhook_url, secret, title="灯塔消息推送", session=None):
     timestamp = str(int(time.time()))
     string_to_sign = '{}\n{}'.format(timestamp, secret)
     hmac_code = hmac.new(string_to_sign.encode("utf-8"), digestmod=hashlib.sha256).digest()
@@ -333,16 +336,16 @@ def feishu_send(msg, webhook_url, secret, title="灯塔消息推送"):
             }
         }
     }
-    conn = http_req(webhook_url, method='post', json=send_data)
+    conn = http_req(webhook_url, method='post', session=session or _session, json=send_data)
     return conn.json()
 
 
-def wx_work_send(msg, webhook_url):
+def wx_work_send(msg, webhook_url, session=None):
     send_data = {
         "msgtype": "markdown",
         "markdown":{
             "content": msg
         }
     }
-    conn = http_req(webhook_url, method='post', json=send_data)
+    conn = http_req(webhook_url, method='post', session=session or _session, json=send_data)
     return conn.json()
@@ -36,3 +36,8 @@ def parse_datetime(s):
     else:
         date1 = datetime.datetime.strptime(s, "%Y-%m-%dT%H:%M:%SZ")
         return date1 + datetime.timedelta(hours=8)
+
+
+# parse_datetime 处理 Z 结尾时间的逆操作，用于和 GitHub 返回的时间字符串直接比较
+def format_github_datetime(date):
+    return (date - datetime.timedelta(hours=8)).strftime("%Y-%m-%dT%H:%M:%SZ")
@@ -3,6 +3,7 @@ from datetime import datetime, timedelta
 from app.services.github_repo_monitor import (
     GithubRepoMonitor,
     monitor_github_repo,
+    monitor_github_repos_batch,
     format_events_for_dingtalk
 )
 from app.services.dingtalk_webhook import DingTalkWebhook, send_github_event_notification
@@ -24,7 +25,7 @@ class TestGithubRepoMonitor(unittest.TestCase):
         self.assertEqual(monitor.repo_owner, self.repo_owner)
         self.assertEqual(monitor.repo_name, self.repo_name)
         self.assertEqual(monitor.full_repo_name, f"{self.repo_owner}/{self.repo_name}")
-        self.assertIsInstance(monitor.monitored_events, list)
+        self.assertIsInstance(monitor.monitored_events, frozenset)
         self.assertIn('PushEvent', monitor.monitored_events)
     
     def test_github_repo_monitor_with_custom_events(self):
@@ -35,7 +36,7 @@ class TestGithubRepoMonitor(unittest.TestCase):
             self.repo_name, 
             monitored_events=custom_events
         )
-        self.assertEqual(monitor.monitored_events, custom_events)
+        self.assertEqual(monitor.monitored_events, frozenset(custom_events))
     
     def test_fetch_events(self):
         """Test fetching events from GitHub (requires valid token)"""
@@ -63,6 +64,18 @@ class TestGithubRepoMonitor(unittest.TestCase):
         )
         
         self.assertIsInstance(events, list)
+
+    def test_monitor_github_repos_batch(self):
+        """Test monitoring several repositories concurrently"""
+        if not Config.GITHUB_TOKEN:
+            self.skipTest("GITHUB_TOKEN not configured")
+
+        specs = [(self.repo_owner, self.repo_name), ("octocat", "Spoon-Knife")]
+        results = monitor_github_repos_batch(specs, since_time=datetime.now() - timedelta(days=7))
+
+        self.assertEqual(set(results), {"octocat/Hello-World", "octocat/Spoon-Knife"})
+        for events in results.values():
+            self.assertIsInstance(events, list)
     
     def test_format_events_for_dingtalk(self):
         """Test DingTalk markdown formatting"""
@@ -111,6 +124,22 @@ class TestDingTalkWebhook(unittest.TestCase):
         self.assertTrue(len(timestamp) > 0)
         self.assertTrue(len(sign) > 0)
 
+    def test_generate_sign_matches_reference(self):
+        """Test signature from the cached HMAC state matches a freshly keyed HMAC"""
+        import base64
+        import hashlib
+        import hmac
+        import urllib.parse
+
+        secret = "test_secret"
+        dingtalk = DingTalkWebhook("https://oapi.dingtalk.com/robot/send?access_token=test", secret)
+
+        for _ in range(2):
+            timestamp, sign = dingtalk._generate_sign()
+            string_to_sign = f'{timestamp}\n{secret}'.encode('utf-8')
+            hmac_code = hmac.new(secret.encode('utf-8'), string_to_sign, digestmod=hashlib.sha256).digest()
+            self.assertEqual(sign, urllib.parse.quote_plus(base64.b64encode(hmac_code)))
+
 
 class TestIntegration(unittest.TestCase):
     """Integration tests (require valid configuration)"""
@@ -2,6 +2,8 @@ import unittest
 from app.utils.github_task import submit_github_task
 from app.celerytask import CeleryAction
 from app.modules import TaskStatus
+from app.services.githubSearch import GithubResult
+from app.tasks.github import GithubTaskTask
 
 
 class TestGithubTask(unittest.TestCase):
@@ -28,6 +30,24 @@ class TestGithubTask(unittest.TestCase):
         # 下发周期运行任务
         submit_github_task(task_data=task_data, action=CeleryAction.GITHUB_TASK_MONITOR, delay_flag=False)
 
+    def test_filter_result(self):
+        task = GithubTaskTask(task_id="60c99bea6591e74c1ddc1f46", keyword="password")
+
+        def build_result(path, content):
+            item = {
+                "git_url": "https://api.github.com/repos/a/b/git/blobs/c",
+                "html_url": "https://github.com/a/b/blob/master/" + path,
+                "repository": {"full_name": "a/b"},
+                "path": path
+            }
+            result = GithubResult(item)
+            result._content = content
+            return result
+
+        self.assertTrue(task.filter_result(build_result("luci-app-dnsfilter/a.conf", "password")))
+        self.assertTrue(task.filter_result(build_result("rules.list", "DOMAIN-SUFFIX,example.com")))
+        self.assertFalse(task.filter_result(build_result("config.py", "password = 123")))
+
 
 if __name__ == '__main__':
     unittest.main()
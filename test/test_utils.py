@@ -82,6 +82,27 @@ class TestCDNName(unittest.TestCase):
         self.assertTrue(result[0] == finger_list[0]["name"])
         self.assertTrue(result[3] == finger_list[3]["name"])
 
+    def test_check_cron_next(self):
+        check_flag, msg, next_sec = utils.check_cron_next("0 1 * * *")
+        self.assertTrue(check_flag)
+        self.assertTrue(0 < next_sec <= 24 * 60 * 60)
+
+        check_flag, msg, _ = utils.check_cron_next("*/5 * * * *")
+        self.assertFalse(check_flag)
+
+        check_flag, msg, _ = utils.check_cron_next("xxx")
+        self.assertFalse(check_flag)
+
+        self.assertIs(utils.parse_cron("0 1 * * *"), utils.parse_cron("0 1 * * *"))
+
+    def test_run_due_schedulers(self):
+        checked = []
+        utils.run_due_schedulers([{"_id": 1}, {"_id": 2}, {"_id": 3}], lambda item: checked.append(item["_id"]))
+        self.assertEqual(sorted(checked), [1, 2, 3])
+
+        utils.run_due_schedulers([], checked.append)
+        self.assertEqual(len(checked), 3)
+
 
 if __name__ == '__main__':
     unittest.main()